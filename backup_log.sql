@@ -35,6 +35,18 @@ CREATE TABLE `tbl_backup` (
   `updated_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp()
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `tbl_backup_manifest`
+--
+
+CREATE TABLE `tbl_backup_manifest` (
+  `name` varchar(200) NOT NULL,
+  `chunk` int(11) NOT NULL,
+  `data` mediumblob NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
 --
 -- Indexes for dumped tables
 --
@@ -43,7 +55,14 @@ CREATE TABLE `tbl_backup` (
 -- Indexes for table `tbl_backup`
 --
 ALTER TABLE `tbl_backup`
-  ADD PRIMARY KEY (`id`);
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `name` (`name`);
+
+--
+-- Indexes for table `tbl_backup_manifest`
+--
+ALTER TABLE `tbl_backup_manifest`
+  ADD PRIMARY KEY (`name`,`chunk`);
 
 --
 -- AUTO_INCREMENT for dumped tables
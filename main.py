@@ -1,14 +1,26 @@
+import io
 import os
-import xxhash
 import shutil
+import stat
+import xxhash
 import subprocess
 import time
 import pymysql
 import json
 import logging
+import queue
+import tarfile
+import tempfile
+import threading
+import zstandard
+import httplib2
+import google_auth_httplib2
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaUpload
 from dotenv import load_dotenv
 
 # Setup logging
@@ -32,6 +44,8 @@ try:
         directories_to_backup = config['directories']
         database_names = config['databases']
         excluded_tables = config.get('excluded_tables', {})
+        max_workers = config.get('max_workers', 8)
+        dump_threads = config.get('dump_threads', 1)
 except Exception as e:
     logging.error(f"Failed to load configuration: {e}")
     raise
@@ -42,19 +56,379 @@ db_config = {
     'password': os.getenv('DB_PASSWORD')
 }
 
+MYSQLDUMP_ARGS = [
+    'mysqldump',
+    '--skip-dump-date',
+    '--skip-comments',
+    '--single-transaction',
+    '--quick',
+    f"-u{db_config['user']}",
+    f"-p{db_config['password']}",
+]
+# Dump from the same server the table list and metadata come from
+if db_config['host']:
+    MYSQLDUMP_ARGS.append(f"-h{db_config['host']}")
+# Protocol compression only pays off once the dump crosses a real network
+if db_config['host'] and db_config['host'] not in (
+        'localhost', '127.0.0.1', '::1') and not db_config['host'].startswith('/'):
+    MYSQLDUMP_ARGS.append('--compress')
+
 meta_table = 'tbl_backup'
+manifest_table = 'tbl_backup_manifest'
+# Manifests are stored in pieces well below MySQL's default 16 MiB
+# max_allowed_packet, so even trees with millions of files fit
+MANIFEST_CHUNK_SIZE = 4 * 1024 * 1024
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
+HASH_CHUNK_SIZE = 1 << 20  # 1 MiB read buffer for hashing
+HASH_THREADS = 8  # concurrent file reads when hashing changed files
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # must be a multiple of 256 KiB
+SIMPLE_UPLOAD_LIMIT = 5 * 1024 * 1024  # smaller files skip the resumable handshake
+# Stored hashes are prefixed with the algorithm, so rows written by an older
+# algorithm never compare equal and simply trigger one fresh upload
+HASH_TAG = 'xxh3_128'
+FILE_HASH_TAG = 'xxh3_64'  # per-file digests kept in directory manifests
+DRIVE_QUERY_BATCH = 50  # names per files.list query, keeps the URL short
+
+ZSTD_LEVEL = 6
+DUMP_SPOOL_SIZE = 64 * 1024 * 1024  # per-table dumps beyond this go to a temp file
+META_POOL_SIZE = 4  # metadata DB connections kept warm across worker threads
+
+_local = threading.local()
+_credentials = None
+_credentials_lock = threading.Lock()
+# Idle metadata connections, most recently used first; nothing connects
+# until the first borrow
+_meta_idle = queue.LifoQueue()
+_meta_slots = threading.BoundedSemaphore(META_POOL_SIZE)
+
+
+def tagged_hash(hasher):
+    return f"{HASH_TAG}:{hasher.hexdigest()}"
 
 
 def compute_hash(path):
     logging.debug(f"Computing hash for: {path}")
-    hasher = xxhash.xxh64()
-    with open(path, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            hasher.update(chunk)
+    hasher = xxhash.xxh3_64()
+    buf = memoryview(bytearray(HASH_CHUNK_SIZE))
+    with open(path, 'rb', buffering=0) as f:
+        while n := f.readinto(buf):
+            hasher.update(buf[:n])
     return hasher.hexdigest()
 
 
+class HashingReader(io.RawIOBase):
+    """Read-only stream that hashes every byte read through it."""
+
+    def __init__(self, raw, hasher):
+        self._raw = raw
+        self.hasher = hasher
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self._raw.readinto(b)
+        if n:
+            self.hasher.update(memoryview(b)[:n])
+        return n
+
+
+class StreamMediaUpload(MediaUpload):
+    """Resumable upload of unknown length fed from a forward-only stream.
+
+    After a partial chunk the client asks again from the last offset the
+    server acknowledged, so the most recent chunk is kept for re-sending.
+    """
+
+    def __init__(self, stream, mimetype, chunksize=UPLOAD_CHUNK_SIZE):
+        super().__init__()
+        self._stream = stream
+        self._mimetype = mimetype
+        self._chunksize = chunksize
+        self._buf = b''
+        self._buf_start = 0
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def size(self):
+        return None
+
+    def resumable(self):
+        return True
+
+    def getbytes(self, begin, length):
+        self._buf = self._buf[begin - self._buf_start:]
+        self._buf_start = begin
+        while len(self._buf) < length:
+            data = self._stream.read(length - len(self._buf))
+            if not data:
+                break
+            self._buf += data
+        return self._buf[:length]
+
+
+def new_compressor():
+    # Frames carry zstd's own content checksum, so a corrupted download is
+    # caught on restore without storing a second digest of the archive
+    return zstandard.ZstdCompressor(
+        level=ZSTD_LEVEL, threads=-1, write_checksum=True)
+
+
+def _dump_table(cmd):
+    spool = tempfile.SpooledTemporaryFile(max_size=DUMP_SPOOL_SIZE)
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    with proc.stdout:
+        shutil.copyfileobj(proc.stdout, spool, HASH_CHUNK_SIZE)
+    if proc.wait() != 0:
+        spool.close()
+        raise subprocess.CalledProcessError(proc.returncode, 'mysqldump')
+    spool.seek(0)
+    return spool
+
+
+class ParallelDump(io.RawIOBase):
+    """Runs one mysqldump per table on a thread pool and reads the results
+    back in table order, so the combined dump is the same on every run.
+
+    Only `threads` tables are queued ahead of the one being read, so at
+    most that many finished dumps sit in their spools at once.
+    A failed table surfaces as CalledProcessError from read().
+    """
+
+    def __init__(self, cmds, threads):
+        self._pool = ThreadPoolExecutor(max_workers=threads)
+        self._cmds = iter(cmds)
+        self._window = threads
+        self._pending = deque()
+        self._current = None
+        self._fill()
+
+    def _fill(self):
+        while len(self._pending) < self._window:
+            cmd = next(self._cmds, None)
+            if cmd is None:
+                break
+            self._pending.append(self._pool.submit(_dump_table, cmd))
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while True:
+            if self._current is None:
+                if not self._pending:
+                    return 0
+                future = self._pending.popleft()
+                self._fill()
+                self._current = future.result()
+            data = self._current.read(len(b))
+            if data:
+                b[:len(data)] = data
+                return len(data)
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        if not self.closed:
+            for future in self._pending:
+                future.cancel()
+            self._pool.shutdown(wait=True)
+            for future in self._pending:
+                if not future.cancelled() and future.exception() is None:
+                    future.result().close()
+            if self._current is not None:
+                self._current.close()
+        super().close()
+
+
+def _tarinfo(arcname, st, linkname=''):
+    info = tarfile.TarInfo(arcname)
+    info.mode = stat.S_IMODE(st.st_mode)
+    info.uid = st.st_uid
+    info.gid = st.st_gid
+    info.mtime = st.st_mtime
+    if stat.S_ISDIR(st.st_mode):
+        info.type = tarfile.DIRTYPE
+    elif stat.S_ISLNK(st.st_mode):
+        info.type = tarfile.SYMTYPE
+        info.linkname = linkname
+    else:
+        info.size = st.st_size
+    return info
+
+
+class _PaddedReader:
+    """Reads exactly size bytes, zero-padding a file that shrank after it
+    was scanned so the tar stream stays well-formed."""
+
+    def __init__(self, f, size, path):
+        self._f = f
+        self._left = size
+        self._path = path
+
+    def read(self, n):
+        want = min(n, self._left)
+        data = self._f.read(want)
+        if len(data) < want:
+            if self._path:
+                logging.warning(f"File shrank while archiving: {self._path}")
+                self._path = None
+            data += bytes(want - len(data))
+        self._left -= want
+        return data
+
+
+def archive_directory(src_dir, archive_path, stats):
+    """Tar the scanned entries of src_dir into a zstd archive.
+
+    Headers are built from the stat results scan_tree already collected,
+    rather than letting tarfile list and lstat the whole tree again.
+    """
+    root_name = os.path.basename(os.path.normpath(src_dir))
+    cctx = new_compressor()
+    with open(archive_path, 'wb') as out, \
+            cctx.stream_writer(out, closefd=False) as comp, \
+            tarfile.open(fileobj=comp, mode='w|') as tar:
+        # Follow a symlinked root, as os.scandir did when scanning it
+        tar.addfile(_tarinfo(root_name, os.stat(src_dir)))
+        for relpath in sorted(stats):
+            st = stats[relpath]
+            full = os.path.join(src_dir, relpath)
+            arcname = f"{root_name}/{relpath}"
+            try:
+                if stat.S_ISREG(st.st_mode):
+                    with open(full, 'rb') as f:
+                        tar.addfile(_tarinfo(arcname, st),
+                                    _PaddedReader(f, st.st_size, full))
+                elif stat.S_ISLNK(st.st_mode):
+                    tar.addfile(_tarinfo(arcname, st, os.readlink(full)))
+                else:
+                    tar.addfile(_tarinfo(arcname, st))
+            except (FileNotFoundError, PermissionError) as e:
+                logging.warning(f"Skipping {full} while archiving: {e}")
+    return archive_path
+
+
+def scan_tree(root):
+    """Map each directory, regular file and symlink under root (relative,
+    '/'-separated) to its lstat, using os.scandir's cached file types."""
+    stats = {}
+    pending = [(root, '')]
+    while pending:
+        path, rel = pending.pop()
+        try:
+            it = os.scandir(path)
+        except (FileNotFoundError, PermissionError) as e:
+            if path == root:
+                raise
+            logging.warning(f"Skipping unreadable directory {path}: {e}")
+            continue
+        with it:
+            for entry in it:
+                relpath = f"{rel}{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append((entry.path, f"{relpath}/"))
+                elif not (entry.is_file(follow_symlinks=False)
+                          or entry.is_symlink()):
+                    continue  # sockets, FIFOs and devices are not backed up
+                try:
+                    stats[relpath] = entry.stat(follow_symlinks=False)
+                except (FileNotFoundError, PermissionError) as e:
+                    logging.warning(f"Skipping {entry.path}: {e}")
+    return stats
+
+
+def _safe_hash(path):
+    try:
+        return compute_hash(path)
+    except (FileNotFoundError, PermissionError) as e:
+        logging.warning(f"Skipping {path}: {e}")
+        return None
+
+
+def build_manifest(root, stats, prev_manifest):
+    """Return {relpath: [mtime_ns, size, digest]} for the scanned tree.
+
+    Only entries whose mtime or size changed since prev_manifest are
+    hashed again; directories and symlinks get a marker digest instead.
+    Entries that vanished or cannot be read are left out.
+    """
+    manifest = {}
+    to_hash = []
+    for relpath, st in stats.items():
+        prev = prev_manifest.get(relpath)
+        if prev and prev[0] == st.st_mtime_ns and prev[1] == st.st_size:
+            digest = prev[2]
+        elif stat.S_ISDIR(st.st_mode):
+            digest = '/'
+        elif stat.S_ISLNK(st.st_mode):
+            try:
+                target = os.readlink(os.path.join(root, relpath))
+            except FileNotFoundError as e:
+                logging.warning(f"Skipping {os.path.join(root, relpath)}: {e}")
+                continue
+            digest = '@' + xxhash.xxh3_64(os.fsencode(target)).hexdigest()
+        else:
+            to_hash.append(relpath)
+            continue
+        manifest[relpath] = [st.st_mtime_ns, st.st_size, digest]
+
+    # Hash changed files concurrently so many small files keep the disk
+    # queue full instead of being read one at a time
+    if to_hash:
+        paths = [os.path.join(root, relpath) for relpath in to_hash]
+        with ThreadPoolExecutor(max_workers=HASH_THREADS) as pool:
+            for relpath, digest in zip(to_hash, pool.map(_safe_hash, paths)):
+                if digest is None:
+                    continue
+                st = stats[relpath]
+                manifest[relpath] = [st.st_mtime_ns, st.st_size, digest]
+    return manifest
+
+
+def manifest_unchanged(stats, prev_manifest):
+    if len(stats) != len(prev_manifest):
+        return False
+    for relpath, st in stats.items():
+        prev = prev_manifest.get(relpath)
+        if not prev or prev[0] != st.st_mtime_ns or prev[1] != st.st_size:
+            return False
+    return True
+
+
+def tree_digest(manifest):
+    hasher = xxhash.xxh3_128()
+    for relpath in sorted(manifest):
+        hasher.update(os.fsencode(relpath))
+        hasher.update(b'\0')
+        hasher.update(manifest[relpath][2].encode())
+        hasher.update(b'\n')
+    return tagged_hash(hasher)
+
+
+def encode_manifest(manifest):
+    doc = {'hash': FILE_HASH_TAG, 'entries': manifest}
+    return zstandard.compress(json.dumps(doc, separators=(',', ':')).encode())
+
+
+def decode_manifest(blob):
+    if not blob:
+        return {}
+    try:
+        doc = json.loads(zstandard.decompress(blob))
+    except (zstandard.ZstdError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable manifest: {e}")
+        return {}
+    # Digests from another algorithm cannot be reused, so start over
+    if not isinstance(doc, dict) or doc.get('hash') != FILE_HASH_TAG:
+        return {}
+    return doc['entries']
+
+
 def get_db_connection(database=None):
     return pymysql.connect(
         host=db_config['host'],
@@ -65,34 +439,104 @@ def get_db_connection(database=None):
     )
 
 
-def get_previous_hash(logical_name):
-    conn = get_db_connection(meta_db)
-    with conn.cursor() as cur:
+@contextmanager
+def meta_connection():
+    """Borrow a pooled metadata DB connection for the duration of a block."""
+    with _meta_slots:
+        try:
+            conn = _meta_idle.get_nowait()
+            conn.ping(reconnect=True)
+        except queue.Empty:
+            conn = get_db_connection(meta_db)
+        try:
+            yield conn
+        except Exception:
+            conn.close()
+            raise
+        _meta_idle.put(conn)
+
+
+def get_previous_hashes(logical_names):
+    if not logical_names:
+        return {}
+    placeholders = ', '.join(['%s'] * len(logical_names))
+    with meta_connection() as conn, conn.cursor() as cur:
         cur.execute(
-            f"SELECT hash FROM {meta_table} WHERE name=%s", (logical_name,))
-        row = cur.fetchone()
-    conn.close()
-    return row[0] if row else None
+            f"SELECT name, hash FROM {meta_table} WHERE name IN ({placeholders})",
+            list(logical_names))
+        return dict(cur.fetchall())
 
 
-def update_hash(logical_name, new_hash):
-    logging.info(f"Updating hash for {logical_name}")
-    conn = get_db_connection(meta_db)
-    with conn.cursor() as cur:
+def get_previous_manifest(logical_name):
+    with meta_connection() as conn, conn.cursor() as cur:
         cur.execute(
-            f"INSERT INTO {meta_table}(name, hash) VALUES(%s, %s) "
-            "ON DUPLICATE KEY UPDATE hash=VALUES(hash)",
-            (logical_name, new_hash)
-        )
-    conn.close()
+            f"SELECT data FROM {manifest_table} WHERE name=%s ORDER BY chunk",
+            (logical_name,))
+        blob = b''.join(row[0] for row in cur.fetchall())
+    return decode_manifest(blob)
+
+
+def update_hash(logical_name, new_hash, manifest=None):
+    logging.info(f"Updating hash for {logical_name}")
+    with meta_connection() as conn, conn.cursor() as cur:
+        if manifest is None:
+            cur.execute(
+                f"INSERT INTO {meta_table}(name, hash) VALUES(%s, %s) "
+                "ON DUPLICATE KEY UPDATE hash=VALUES(hash)",
+                (logical_name, new_hash)
+            )
+            return
+
+        # Hash and manifest chunks are replaced in one transaction, so a
+        # failure part-way never leaves a hash paired with a stale manifest
+        blob = encode_manifest(manifest)
+        conn.begin()
+        try:
+            cur.execute(
+                f"INSERT INTO {meta_table}(name, hash) VALUES(%s, %s) "
+                "ON DUPLICATE KEY UPDATE hash=VALUES(hash)",
+                (logical_name, new_hash)
+            )
+            cur.execute(
+                f"DELETE FROM {manifest_table} WHERE name=%s", (logical_name,))
+            for chunk, start in enumerate(
+                    range(0, len(blob), MANIFEST_CHUNK_SIZE)):
+                cur.execute(
+                    f"INSERT INTO {manifest_table}(name, chunk, data) "
+                    "VALUES(%s, %s, %s)",
+                    (logical_name, chunk,
+                     blob[start:start + MANIFEST_CHUNK_SIZE])
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def get_credentials():
+    # Loaded and refreshed once, so the worker threads' services share a
+    # single access token instead of each fetching their own
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            creds = service_account.Credentials.from_service_account_file(
+                SERVICE_ACCOUNT_FILE, scopes=SCOPES
+            )
+            creds.refresh(google_auth_httplib2.Request(httplib2.Http()))
+            _credentials = creds
+    return _credentials
 
 
 def get_drive_service():
     logging.info("Initializing Google Drive service...")
-    creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES
-    )
-    return build('drive', 'v3', credentials=creds)
+    return build('drive', 'v3', credentials=get_credentials())
+
+
+def get_thread_drive_service():
+    # Drive clients are not thread-safe, so each worker thread gets its own
+    if getattr(_local, 'service', None) is None:
+        _local.service = get_drive_service()
+    return _local.service
 
 
 def get_or_create_drive_folder_by_name(name, parent_id, service):
@@ -115,95 +559,304 @@ def get_or_create_drive_folder_by_name(name, parent_id, service):
     return folder['id']
 
 
-def upload_to_drive(local_path, folder_id, service):
-    filename = os.path.basename(local_path)
-    logging.info(f"Uploading: {filename} to Google Drive")
-    query = f"name='{filename}' and '{folder_id}' in parents and trashed=false"
-    resp = service.files().list(q=query, fields='files(id)').execute()
-    files = resp.get('files', [])
-    media = MediaFileUpload(local_path, resumable=True)
-    if files:
+def _drive_quote(value):
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+def list_existing(folder_id, names, service):
+    """Return {name: file_id} for those names already in the Drive folder."""
+    existing = {}
+    for i in range(0, len(names), DRIVE_QUERY_BATCH):
+        clauses = ' or '.join(
+            f"name='{_drive_quote(n)}'" for n in names[i:i + DRIVE_QUERY_BATCH])
+        query = f"'{folder_id}' in parents and trashed=false and ({clauses})"
+        page_token = None
+        while True:
+            resp = service.files().list(
+                q=query, fields='nextPageToken, files(id, name)',
+                pageToken=page_token).execute()
+            for f in resp.get('files', []):
+                existing.setdefault(f['name'], f['id'])
+            page_token = resp.get('nextPageToken')
+            if not page_token:
+                break
+    return existing
+
+
+def _execute_upload(request, filename):
+    if not request.resumable:
+        return request.execute()
+    response = None
+    while response is None:
+        status, response = request.next_chunk()
+        if status:
+            logging.debug(
+                f"Uploaded {status.resumable_progress} bytes of {filename}")
+    return response
+
+
+def put_drive_file(filename, media, folder_id, service, file_id=None):
+    if file_id:
         logging.info(f"File exists. Updating existing file: {filename}")
-        return service.files().update(fileId=files[0]['id'], media_body=media).execute()
+        request = service.files().update(fileId=file_id, media_body=media)
     else:
         logging.info(f"Creating new file on Drive: {filename}")
         file_metadata = {'name': filename, 'parents': [folder_id]}
-        return service.files().create(body=file_metadata, media_body=media).execute()
+        request = service.files().create(body=file_metadata, media_body=media)
+    return _execute_upload(request, filename)
+
+
+def upload_to_drive(local_path, folder_id, service, mimetype=None,
+                    existing_id=None):
+    filename = os.path.basename(local_path)
+    logging.info(f"Uploading: {filename} to Google Drive")
+    resumable = os.path.getsize(local_path) > SIMPLE_UPLOAD_LIMIT
+    media = MediaFileUpload(local_path, mimetype=mimetype,
+                            chunksize=UPLOAD_CHUNK_SIZE, resumable=resumable)
+    return put_drive_file(filename, media, folder_id, service, existing_id)
+
+
+def run_parallel(func, items, *args):
+    """Run func over items concurrently and return how many failed.
+
+    An item fails if func raises or returns False.
+    """
+    if not items:
+        return 0
+    failures = 0
+    workers = min(max_workers, len(items))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(func, item, *args): item for item in items}
+        for future in as_completed(futures):
+            try:
+                if future.result() is False:
+                    failures += 1
+            except Exception as e:
+                failures += 1
+                logging.exception(f"Backup failed for {futures[future]}: {e}")
+    return failures
+
+
+def dir_logical_name(directory):
+    return f"{directory['name']}_{os.path.basename(directory['path'])}"
+
+
+def dir_archive_name(directory):
+    return f"{dir_logical_name(directory)}.tar.zst"
+
+
+def db_dump_name(db):
+    return f"{db}.sql.zst"
+
+
+def db_fingerprint_name(db):
+    return f"{db}:fingerprint"
+
+
+def _quote_ident(name):
+    return '`' + name.replace('`', '``') + '`'
+
+
+def db_fingerprint(db, tables_no_data):
+    """Summarise a database's schema, triggers and table checksums.
+
+    Computed on the server without transferring any rows, so an unchanged
+    database can be skipped before it is dumped and uploaded.
+    """
+    conn = get_db_connection(db)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SHOW FULL TABLES")
+            rows = cur.fetchall()
+            creates = []
+            for table, _ in rows:
+                cur.execute(f"SHOW CREATE TABLE {_quote_ident(table)}")
+                creates.append(cur.fetchone())
+            # Tables dumped without data only contribute their schema
+            checked = [table for table, kind in rows
+                       if kind != 'VIEW' and table not in tables_no_data]
+            checksums = ()
+            if checked:
+                cur.execute(
+                    "CHECKSUM TABLE " + ', '.join(map(_quote_ident, checked)))
+                checksums = cur.fetchall()
+            cur.execute("SHOW TRIGGERS")
+            triggers = cur.fetchall()
+    finally:
+        conn.close()
+    hasher = xxhash.xxh3_128(repr((rows, creates, checksums, triggers)).encode())
+    return tagged_hash(hasher)
+
+
+def _backup_one_dir(directory, folder_id, prev_hashes, existing):
+    if not os.path.isdir(directory['path']):
+        logging.warning(f"Directory not found: {directory['path']}")
+        return
+
+    logical_name = dir_logical_name(directory)
+    prev_manifest = get_previous_manifest(logical_name)
+    stats = scan_tree(directory['path'])
+
+    # A stat walk is enough to rule out changes in the common case
+    if prev_manifest and manifest_unchanged(stats, prev_manifest):
+        logging.info(
+            f"No changes detected in {logical_name}, skipping upload.")
+        return
+
+    manifest = build_manifest(directory['path'], stats, prev_manifest)
+    h = tree_digest(manifest)
+    prev = prev_hashes.get(logical_name)
+
+    if h == prev:
+        logging.info(
+            f"No content changes in {logical_name}, skipping upload.")
+        update_hash(logical_name, h, manifest)
+        return
+
+    archive_name = dir_archive_name(directory)
+    logging.info(f"Detected changes in {logical_name}, uploading...")
+    logging.info(f"Archiving directory: {directory['path']} → {archive_name}")
+    try:
+        # Only archive what made it into the manifest
+        archive_directory(directory['path'], archive_name,
+                          {relpath: stats[relpath] for relpath in manifest})
+        upload_to_drive(archive_name, folder_id, get_thread_drive_service(),
+                        mimetype='application/zstd',
+                        existing_id=existing.get(archive_name))
+        update_hash(logical_name, h, manifest)
+    finally:
+        # Also clears a partial archive left by a failed write
+        if os.path.exists(archive_name):
+            os.remove(archive_name)
+            logging.debug(f"Removed temporary archive: {archive_name}")
 
 
 def backup_directories(service, folder_id):
     logging.info("Starting directory backup...")
-    for directory in directories_to_backup:
-        if not os.path.isdir(directory['path']):
-            logging.warning(f"Directory not found: {directory['path']}")
-            continue
+    prev_hashes = get_previous_hashes(
+        [dir_logical_name(d) for d in directories_to_backup])
+    existing = list_existing(
+        folder_id, [dir_archive_name(d) for d in directories_to_backup], service)
+    return run_parallel(_backup_one_dir, directories_to_backup,
+                        folder_id, prev_hashes, existing)
 
-        logical_name = f"{directory['name']}_{os.path.basename(directory['path'])}"
-        zip_name = f"{logical_name}.zip"
-        logging.info(f"Archiving directory: {directory['path']} → {zip_name}")
-        shutil.make_archive(zip_name[:-4], 'zip', directory['path'])
 
-        h = compute_hash(zip_name)
-        prev = get_previous_hash(logical_name)
+def mysqldump_cmd(*args):
+    return [*MYSQLDUMP_ARGS, *args]
 
-        if h != prev:
-            logging.info(f"Detected changes in {logical_name}, uploading...")
-            upload_to_drive(zip_name, folder_id, service)
-            update_hash(logical_name, h)
-        else:
-            logging.info(
-                f"No changes detected in {logical_name}, skipping upload.")
 
-        os.remove(zip_name)
-        logging.debug(f"Removed temporary archive: {zip_name}")
+def table_dump_commands(db, tables_no_data):
+    conn = get_db_connection(db)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SHOW FULL TABLES")
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    # Everything but views is dumped as a table, which also covers MariaDB's
+    # SEQUENCE and SYSTEM VERSIONED types, matching a whole-database dump
+    cmds = []
+    for table, kind in rows:
+        if kind != 'VIEW':
+            no_data = ['--no-data'] if table in tables_no_data else []
+            cmds.append(mysqldump_cmd(*no_data, db, table))
+    # Views go last so the tables they select from already exist
+    views = [table for table, kind in rows if kind == 'VIEW']
+    if views:
+        cmds.append(mysqldump_cmd(db, *views))
+    return cmds
+
+
+def _backup_one_db(db, folder_id, prev_hashes, existing):
+    dump_name = db_dump_name(db)
+    cmd = mysqldump_cmd(db)
+
+    # Process tables with no data (structure only)
+    tables_no_data = excluded_tables.get(db, [])
+    if tables_no_data:
+        logging.info(
+            f"Excluding data for tables in {db}: {', '.join(tables_no_data)}")
+        # First create a full schema dump with all tables
+        for table in tables_no_data:
+            # Add individual no-data tables with specific options
+            cmd.extend([
+                '--ignore-table-data',
+                f'{db}.{table}'
+            ])
+
+    # Dumping streams the whole database to Drive, so rule out the common
+    # unchanged case first with a fingerprint taken on the server
+    fingerprint_name = db_fingerprint_name(db)
+    try:
+        fingerprint = db_fingerprint(db, tables_no_data)
+    except pymysql.MySQLError as e:
+        logging.warning(f"Could not fingerprint DB {db}, dumping anyway: {e}")
+        fingerprint = None
+    if fingerprint and fingerprint == prev_hashes.get(fingerprint_name):
+        logging.info(f"No changes detected in DB {db}, skipping dump.")
+        return
+
+    service = get_thread_drive_service()
+    existing_id = existing.get(dump_name)
+
+    # Stream the dump straight to Drive, hashing the plain SQL and then
+    # compressing it on the way through, so it never lands on local disk
+    logging.info(f"Dumping database: {db} → Google Drive ({dump_name})")
+    hasher = xxhash.xxh3_128()
+    cctx = new_compressor()
+    if dump_threads > 1:
+        # Tables are dumped concurrently, each in its own snapshot
+        proc = None
+        source = ParallelDump(
+            table_dump_commands(db, tables_no_data), dump_threads)
+    else:
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, bufsize=HASH_CHUNK_SIZE)
+        source = proc.stdout
+    try:
+        compressed = cctx.stream_reader(HashingReader(source, hasher))
+        media = StreamMediaUpload(compressed, 'application/zstd')
+        # Always upload as a new file; an existing copy is only replaced
+        # once the dump is known to be complete and changed
+        uploaded = put_drive_file(dump_name, media, folder_id, service)
+    except subprocess.CalledProcessError as e:
+        logging.error(f"mysqldump failed for {db}: {e}")
+        return False
+    finally:
+        source.close()
+        returncode = proc.wait() if proc else 0
+
+    if returncode != 0:
+        logging.error(f"mysqldump failed for {db}: exit status {returncode}")
+        service.files().delete(fileId=uploaded['id']).execute()
+        return False
+
+    h = tagged_hash(hasher)
+    prev = prev_hashes.get(db)
+
+    if h != prev:
+        logging.info(f"Changes detected in DB {db}, keeping upload.")
+        if existing_id:
+            service.files().delete(fileId=existing_id).execute()
+        update_hash(db, h)
+    else:
+        logging.info(f"No changes detected in DB {db}, removing upload.")
+        service.files().delete(fileId=uploaded['id']).execute()
+
+    # Only stored after a successful dump, so a failed run is retried
+    if fingerprint:
+        update_hash(fingerprint_name, fingerprint)
 
 
 def backup_databases(service, folder_id):
     logging.info("Starting database backup...")
-    for db in database_names:
-        dump_file = f"{db}.sql"
-        cmd = [
-            'mysqldump',
-            '--skip-dump-date',
-            '--skip-comments',
-            f"-u{db_config['user']}",
-            f"-p{db_config['password']}",
-            db
-        ]
-
-        # Process tables with no data (structure only)
-        tables_no_data = excluded_tables.get(db, [])
-        if tables_no_data:
-            logging.info(
-                f"Excluding data for tables in {db}: {', '.join(tables_no_data)}")
-            # First create a full schema dump with all tables
-            for table in tables_no_data:
-                # Add individual no-data tables with specific options
-                cmd.extend([
-                    '--ignore-table-data',
-                    f'{db}.{table}'
-                ])
-
-        logging.info(f"Dumping database: {db} → {dump_file}")
-        try:
-            with open(dump_file, 'wb') as f:
-                subprocess.run(cmd, stdout=f, check=True)
-        except subprocess.CalledProcessError as e:
-            logging.error(f"mysqldump failed for {db}: {e}")
-            continue
-
-        h = compute_hash(dump_file)
-        prev = get_previous_hash(db)
-
-        if h != prev:
-            logging.info(f"Changes detected in DB {db}, uploading...")
-            upload_to_drive(dump_file, folder_id, service)
-            update_hash(db, h)
-        else:
-            logging.info(f"No changes detected in DB {db}, skipping upload.")
-
-        os.remove(dump_file)
-        logging.debug(f"Removed temporary SQL dump: {dump_file}")
+    prev_hashes = get_previous_hashes(
+        database_names + [db_fingerprint_name(db) for db in database_names])
+    existing = list_existing(
+        folder_id, [db_dump_name(db) for db in database_names], service)
+    return run_parallel(_backup_one_db, database_names,
+                        folder_id, prev_hashes, existing)
 
 
 def main():
@@ -214,10 +867,14 @@ def main():
         dated_folder_id = get_or_create_drive_folder_by_name(
             date_str, DRIVE_FOLDER_ID, service)
 
-        backup_directories(service, dated_folder_id)
-        backup_databases(service, dated_folder_id)
+        failures = backup_directories(service, dated_folder_id)
+        failures += backup_databases(service, dated_folder_id)
 
-        logging.info("Backup process completed successfully.")
+        if failures:
+            logging.error(
+                f"Backup process finished with {failures} failed item(s).")
+        else:
+            logging.info("Backup process completed successfully.")
     except Exception as e:
         logging.exception(f"Backup process failed: {e}")
 